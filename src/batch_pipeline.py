@@ -3,24 +3,27 @@ import os
 import pandas as pd
 import sqlite3
 import glob
-import yaml
 import logging
+from contextlib import contextmanager
 from datetime import datetime
 import shutil
 
 # Add the parent directory to the Python path so we can import from src
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.config import load_config
 from src.database_setup import DatabaseManager
+from src.file_claim import claim_file
+from src.profiling import StageProfiler
 
 class BatchETLPipeline:
-    def __init__(self, config_path='config.yaml'):
-        # Load configuration
-        with open(config_path, 'r') as file:
-            self.config = yaml.safe_load(file)
+    def __init__(self, config_path='config.yaml', profile=False, bulk_mode=False):
+        self.config = load_config(config_path)
         
         self.db_manager = DatabaseManager(config_path)
         self.setup_logging()
+        self.profiler = StageProfiler('batch', self.config['paths']['log_dir'], enabled=profile)
+        self.bulk_mode = bulk_mode
     
     def setup_logging(self):
         """Setup logging configuration"""
@@ -37,17 +40,32 @@ class BatchETLPipeline:
         )
         self.logger = logging.getLogger(__name__)
     
-    def extract(self):
+    def extract(self, files=None):
         """Extract data from CSV files"""
-        input_dir = self.config['paths']['input_dir']
-        csv_files = glob.glob(f"{input_dir}/*.csv")
+        if files is None and self.config.get('routing', {}).get('enabled', False):
+            # The file router owns the input directory and sends large files
+            # to run_chunked itself
+            self.logger.info("File routing is enabled; leaving the input directory to the router")
+            files = []
         
+        if files is None:
+            # Claim files from the shared input directory so the stream
+            # pipeline never processes the same file
+            input_dir = self.config['paths']['input_dir']
+            claimed_dir = self.config['paths'].get('claimed_dir', 'data/claimed')
+            files = [claim_file(path, claimed_dir) for path in glob.glob(f"{input_dir}/*.csv")]
+            csv_files = [path for path in files if path]
+        else:
+            csv_files = list(files)
+        
+        self.processed_files = []
         if not csv_files:
             self.logger.info("No CSV files found for processing")
             return pd.DataFrame()
         
         dataframes = []
         processed_files = []
+        unreadable_files = []
         
         for file_path in csv_files:
             try:
@@ -58,6 +76,9 @@ class BatchETLPipeline:
                 self.logger.info(f"Extracted {len(df)} records from {file_path}")
             except Exception as e:
                 self.logger.error(f"Error reading {file_path}: {e}")
+                unreadable_files.append(file_path)
+        
+        self.quarantine_files(unreadable_files)
         
         if dataframes:
             combined_df = pd.concat(dataframes, ignore_index=True)
@@ -105,15 +126,27 @@ class BatchETLPipeline:
         
         return df
     
-    def load(self, df):
-        """Load data into SQLite database"""
+    def load(self, df, skip_existing=False):
+        """Load data into SQLite database
+        
+        Returns the number of records inserted, or None if the load failed.
+        """
         if df.empty:
             self.logger.info("No data to load")
-            return
+            return 0
         
         try:
-            self.db_manager.insert_data(df, processing_type="batch")
-            self.logger.info(f"Successfully loaded {len(df)} records to database")
+            inserted = self.db_manager.insert_data(
+                df, processing_type="batch", bulk_mode=self.bulk_mode, skip_existing=skip_existing
+            )
+            if inserted is None:
+                self.logger.error(f"Failed to load {len(df)} records to database")
+            elif inserted < len(df):
+                self.logger.info(f"Successfully loaded {inserted} records to database "
+                                 f"({len(df) - inserted} already stored)")
+            else:
+                self.logger.info(f"Successfully loaded {inserted} records to database")
+            return inserted
         except Exception as e:
             self.logger.error(f"Error loading data: {e}")
             raise
@@ -133,33 +166,133 @@ class BatchETLPipeline:
             except Exception as e:
                 self.logger.error(f"Error archiving {file_path}: {e}")
     
-    def run_pipeline(self):
+    def quarantine_files(self, files):
+        """Move claimed files that could not be processed to the failed directory"""
+        failed_dir = self.config['paths'].get('failed_dir', 'data/failed')
+        
+        for file_path in files:
+            failed_path = claim_file(file_path, failed_dir)
+            if failed_path:
+                self.logger.warning(f"Moved {os.path.basename(file_path)} to {failed_path} for inspection")
+    
+    def run_chunked(self, file_path, chunk_size=None, archive=True):
+        """Run the ETL pipeline over one large, already claimed file in chunks
+        
+        Returns the number of records stored. Chunks whose load failed are
+        counted in self.failed_chunks. Rows whose order_id is already stored,
+        by an earlier chunk or an earlier attempt at the file, are skipped
+        by INSERT OR IGNORE, so memory stays bounded by chunk_size and a
+        failed file can simply be run again. With archive, the file is
+        archived if every chunk loaded and moved to the failed directory
+        otherwise.
+        """
+        if chunk_size is None:
+            chunk_size = self.config.get('routing', {}).get('batch_chunk_size', 50000)
+        
+        self.logger.info(f"Starting chunked batch ETL for {file_path} (chunk size {chunk_size})")
+        self.failed_chunks = 0
+        
+        try:
+            total_loaded = 0
+            reader = pd.read_csv(file_path, chunksize=chunk_size)
+            while True:
+                with self.profiler.stage('extract'):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    break
+                
+                chunk['source_file'] = os.path.basename(file_path)
+                with self.profiler.stage('transform'):
+                    cleaned_chunk = self.transform(chunk)
+                with self.profiler.stage('load'):
+                    inserted = self.load(cleaned_chunk, skip_existing=True)
+                if inserted is None:
+                    self.failed_chunks += 1
+                else:
+                    total_loaded += inserted
+            
+            if archive and self.failed_chunks:
+                self.quarantine_files([file_path])
+            elif archive:
+                self.processed_files = [file_path]
+                with self.profiler.stage('archive'):
+                    self.archive_files()
+            
+            self.logger.info(f"Chunked batch ETL completed: {total_loaded} records from {file_path}")
+            return total_loaded
+            
+        except Exception as e:
+            self.logger.error(f"Chunked pipeline failed for {file_path}: {e}")
+            if archive:
+                self.quarantine_files([file_path])
+            raise
+        finally:
+            self.write_profile()
+    
+    def run_pipeline(self, files=None):
         """Execute the complete ETL pipeline"""
         self.logger.info("Starting batch ETL pipeline")
         
         try:
             # Extract
-            raw_data = self.extract()
+            with self.profiler.stage('extract'):
+                raw_data = self.extract(files)
             
             if raw_data.empty:
                 self.logger.info("No data to process")
+                # Header-only files have nothing to load, so they are done
+                with self.profiler.stage('archive'):
+                    self.archive_files()
                 return
             
             # Transform
-            cleaned_data = self.transform(raw_data)
+            with self.profiler.stage('transform'):
+                cleaned_data = self.transform(raw_data)
             
             # Load
-            self.load(cleaned_data)
+            with self.profiler.stage('load'), self.deferred_indexes():
+                loaded = self.load(cleaned_data)
+            
+            if loaded is None:
+                self.quarantine_files(self.processed_files)
+                self.logger.error("Batch ETL pipeline failed to load data")
+                return
             
             # Archive processed files
-            self.archive_files()
+            with self.profiler.stage('archive'):
+                self.archive_files()
             
             self.logger.info("Batch ETL pipeline completed successfully")
             
         except Exception as e:
             self.logger.error(f"Pipeline failed: {e}")
+            self.quarantine_files(getattr(self, 'processed_files', []))
             raise
+        finally:
+            self.write_profile()
+    
+    @contextmanager
+    def deferred_indexes(self):
+        """In bulk mode, drop secondary indexes for the wrapped loads and rebuild them once after"""
+        if not self.bulk_mode:
+            yield
+            return
+        
+        index_sql = self.db_manager.drop_secondary_indexes()
+        try:
+            yield
+        finally:
+            self.db_manager.rebuild_indexes(index_sql)
+            if index_sql:
+                self.logger.info(f"Rebuilt {len(index_sql)} secondary indexes after bulk load")
+    
+    def write_profile(self):
+        """Write profiling output for the run to the log directory when --profile is on"""
+        prefix = self.profiler.write_report()
+        if prefix:
+            self.logger.info(f"Profile written to {prefix}.*")
 
 if __name__ == "__main__":
-    pipeline = BatchETLPipeline()
+    # --bulk is for initial historical loads into a fresh database
+    pipeline = BatchETLPipeline(profile='--profile' in sys.argv, bulk_mode='--bulk' in sys.argv)
     pipeline.run_pipeline()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import sys
+import os
+import tempfile
+import time
+import pandas as pd
+from datetime import datetime
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_generator import generate_sales_data
+from src.database_setup import DatabaseManager
+
+def prepare_frame(num_records):
+    """Generate sales data shaped like the output of BatchETLPipeline.transform"""
+    df = generate_sales_data(num_records)
+    df['order_date'] = pd.to_datetime(df['order_date'])
+    df['source_file'] = 'benchmark.csv'
+    df['batch_processed_date'] = datetime.now()
+    return df
+
+def time_load(df, method, bulk_mode=False):
+    """Load df into a fresh database and return rows/sec for the sales insert"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManager()
+        db_manager.db_path = os.path.join(tmp_dir, 'benchmark.db')
+        db_manager.create_tables()
+
+        conn = db_manager.create_connection()
+        if bulk_mode:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+
+        start = time.perf_counter()
+        if method == 'to_sql':
+            df.to_sql(db_manager.table_name, conn, if_exists='append', index=False)
+        elif method == 'generic':
+            db_manager.executemany_insert(conn, df, generic=True)
+        else:
+            db_manager.executemany_insert(conn, df)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        conn.close()
+
+    return len(df) / elapsed
+
+def main(num_records=100000):
+    """Compare load-phase throughput of to_sql, the generic load method and the executemany bulk path"""
+    df = prepare_frame(num_records)
+
+    results = [
+        ('to_sql', time_load(df, 'to_sql')),
+        ('generic', time_load(df, 'generic')),
+        ('executemany', time_load(df, 'executemany')),
+        ('executemany (bulk mode)', time_load(df, 'executemany', bulk_mode=True)),
+    ]
+
+    print(f"\nLoad phase throughput for {num_records:,} records:")
+    print(f"{'method':<26} {'rows/sec':>12}")
+    for method, rows_per_sec in results:
+        print(f"{method:<26} {rows_per_sec:>12,.0f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,125 @@
+import sys
+import os
+import pandas as pd
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import load_config
+from src.database_setup import DatabaseManager
+
+class ChangeFeedConsumer:
+    """Reads the change_log feed written by DatabaseManager.insert_data.
+
+    Each consumer keeps its own committed offset in change_feed_offsets, so
+    incremental downstream jobs only touch rows added since their last run.
+    """
+
+    def __init__(self, consumer_name, config_path='config.yaml'):
+        self.config = load_config(config_path)
+
+        self.consumer_name = consumer_name
+        self.db_manager = DatabaseManager(config_path)
+        self.table_name = self.db_manager.table_name
+        self.batch_size = self.config['processing'].get('change_feed_batch_size', 10000)
+
+    def get_offset(self):
+        """Return the last committed offset for this consumer (0 if none)"""
+        conn = self.db_manager.create_connection()
+
+        try:
+            cursor = conn.cursor()
+            self.db_manager.create_change_log_tables(cursor)
+            row = cursor.execute(
+                "SELECT last_offset FROM change_feed_offsets WHERE consumer_name = ?",
+                (self.consumer_name,)
+            ).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def commit(self, offset):
+        """Save the offset up to which this consumer has processed changes"""
+        conn = self.db_manager.create_connection()
+
+        try:
+            cursor = conn.cursor()
+            self.db_manager.create_change_log_tables(cursor)
+            cursor.execute(
+                "INSERT INTO change_feed_offsets (consumer_name, last_offset, updated_at) "
+                "VALUES (?, ?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT(consumer_name) DO UPDATE SET "
+                "last_offset = excluded.last_offset, updated_at = excluded.updated_at",
+                (self.consumer_name, int(offset))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def read_batch(self, from_offset=None, batch_size=None, include_records=False):
+        """Read the next batch of changes after from_offset.
+
+        Uses the change_offset primary key, so the cost is proportional to the
+        batch size rather than the size of sales_records. With include_records
+        the current sales_records columns are joined onto each change.
+        """
+        if from_offset is None:
+            from_offset = self.get_offset()
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        if include_records:
+            query = f"""
+                SELECT c.change_offset, c.batch_id, c.change_type, c.processing_type,
+                       c.timestamp AS change_timestamp, s.*
+                FROM change_log c
+                LEFT JOIN {self.table_name} s ON s.order_id = c.order_id
+                WHERE c.change_offset > ?
+                ORDER BY c.change_offset
+                LIMIT ?
+            """
+        else:
+            query = """
+                SELECT * FROM change_log
+                WHERE change_offset > ?
+                ORDER BY change_offset
+                LIMIT ?
+            """
+
+        conn = self.db_manager.create_connection()
+
+        try:
+            self.db_manager.create_change_log_tables(conn.cursor())
+            return pd.read_sql_query(query, conn, params=(int(from_offset), int(batch_size)))
+        finally:
+            conn.close()
+
+    def consume(self, handler, batch_size=None, include_records=False):
+        """Feed all pending changes to handler in batches, committing after each.
+
+        Returns the number of changes consumed.
+        """
+        offset = self.get_offset()
+        consumed = 0
+
+        while True:
+            batch = self.read_batch(offset, batch_size, include_records)
+            if batch.empty:
+                break
+
+            handler(batch)
+            offset = int(batch['change_offset'].iloc[-1])
+            self.commit(offset)
+            consumed += len(batch)
+
+        return consumed
+
+if __name__ == "__main__":
+    consumer_name = sys.argv[1] if len(sys.argv) > 1 else 'default'
+    consumer = ChangeFeedConsumer(consumer_name)
+    changes = consumer.read_batch()
+
+    print(f"Consumer '{consumer_name}' at offset {consumer.get_offset()}")
+    print(f"Pending changes in next batch: {len(changes)}")
+    if not changes.empty:
+        print(changes.head(20).to_string(index=False))
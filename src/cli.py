@@ -0,0 +1,149 @@
+import sys
+import os
+import argparse
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import load_config
+
+# Pipeline modules pull in pandas (and watchdog for the stream layer), so each
+# command imports what it needs. stats and health only touch sqlite3.
+
+def run_batch(args):
+    """Run one batch ETL pass over the input directory"""
+    from src.batch_pipeline import BatchETLPipeline
+    pipeline = BatchETLPipeline(args.config, profile=args.profile, bulk_mode=args.bulk)
+    pipeline.run_pipeline()
+
+def run_stream(args):
+    """Start the stream pipeline file watcher"""
+    from src.stream_pipeline import StreamETLPipeline
+    pipeline = StreamETLPipeline(args.config, profile=args.profile)
+    pipeline.start_monitoring()
+
+def run_schedule(args):
+    """Start the batch scheduler"""
+    from src.scheduler import main as scheduler_main
+    scheduler_main(args.config, profile=args.profile)
+
+def run_route(args):
+    """Start the file router that splits input between the stream and batch layers"""
+    from src.file_router import FileRouter
+    FileRouter(args.config).start_monitoring()
+
+def run_stats(args):
+    """Print database statistics"""
+    from src.database_setup import DatabaseManager
+    DatabaseManager(args.config).get_stats()
+
+def run_health(args):
+    """Check that the config, directories and database are usable"""
+    import sqlite3
+    config = load_config(args.config)
+    healthy = True
+
+    for name, path in config['paths'].items():
+        status = 'ok' if os.path.isdir(path) else 'missing'
+        print(f"{name:<15} {path:<25} {status}")
+
+    db_path = config['database']['path']
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        conn.close()
+        missing = {config['database']['table_name'], 'processing_log'} - tables
+        if missing:
+            healthy = False
+            print(f"{'database':<15} {db_path:<25} missing tables: {', '.join(sorted(missing))}")
+        else:
+            print(f"{'database':<15} {db_path:<25} ok")
+    except sqlite3.Error as e:
+        healthy = False
+        print(f"{'database':<15} {db_path:<25} {e}")
+
+    print("Healthy" if healthy else "Unhealthy - run: python -m src.database_setup")
+    return 0 if healthy else 1
+
+def run_backfill(args):
+    """Load historical CSV files in chunks without claiming or archiving them"""
+    import glob
+    from src.batch_pipeline import BatchETLPipeline
+
+    files = sorted({path for pattern in args.paths for path in glob.glob(pattern)})
+    if not files:
+        print("No files matched for backfill")
+        return 1
+
+    pipeline = BatchETLPipeline(args.config, profile=args.profile, bulk_mode=args.bulk)
+    # With --bulk, indexes are dropped once for the whole backfill, not per chunk
+    with pipeline.deferred_indexes():
+        for file_path in files:
+            pipeline.run_chunked(file_path, chunk_size=args.chunk_size, archive=False)
+    print(f"Backfilled {len(files)} files")
+
+def run_report(args):
+    """Aggregate archived CSV history out of core and print or save the report"""
+    from src.aggregation import ArchiveAggregator
+
+    aggregator = ArchiveAggregator(args.config, workers=args.workers)
+    report = aggregator.aggregate(args.paths or None, group_by=args.group_by)
+
+    if args.output:
+        report.to_csv(args.output, index=False)
+        print(f"Wrote {len(report)} rows to {args.output}")
+    else:
+        print(report.to_string(index=False))
+
+def build_parser():
+    """Build the argument parser for python -m src"""
+    parser = argparse.ArgumentParser(prog='python -m src', description='Sales data pipeline')
+    parser.add_argument('--config', default='config.yaml', help='path to config.yaml')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch = subparsers.add_parser('run-batch', help='run one batch ETL pass')
+    batch.add_argument('--profile', action='store_true', help='write per-stage profiles to logs/')
+    batch.add_argument('--bulk', action='store_true', help='journal off, deferred indexes (fresh databases only)')
+    batch.set_defaults(func=run_batch)
+
+    stream = subparsers.add_parser('stream', help='watch the input directory and stream new files')
+    stream.add_argument('--profile', action='store_true', help='write per-file profiles to logs/')
+    stream.set_defaults(func=run_stream)
+
+    schedule = subparsers.add_parser('schedule', help='run the batch pipeline every 5 minutes')
+    schedule.add_argument('--profile', action='store_true', help='write per-run profiles to logs/')
+    schedule.set_defaults(func=run_schedule)
+
+    route = subparsers.add_parser('route', help='route input files between the stream and batch layers')
+    route.set_defaults(func=run_route)
+
+    stats = subparsers.add_parser('stats', help='print database statistics')
+    stats.set_defaults(func=run_stats)
+
+    health = subparsers.add_parser('health', help='check config, directories and database')
+    health.set_defaults(func=run_health)
+
+    backfill = subparsers.add_parser('backfill', help='load historical CSV files, e.g. from data/archive')
+    backfill.add_argument('paths', nargs='+', help='CSV files or glob patterns')
+    backfill.add_argument('--chunk-size', type=int, default=None, help='rows per chunk')
+    backfill.add_argument('--profile', action='store_true', help='write per-stage profiles to logs/')
+    backfill.add_argument('--bulk', action='store_true', help='journal off, deferred indexes (fresh databases only)')
+    backfill.set_defaults(func=run_backfill)
+
+    report = subparsers.add_parser('report', help='aggregate archived CSV history in bounded memory')
+    report.add_argument('paths', nargs='*', help='CSV files or glob patterns (default: archive_dir/*.csv)')
+    report.add_argument('--group-by', nargs='+', default=['product', 'region', 'month'],
+                        choices=['product', 'region', 'month'], help='grouping columns')
+    report.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    report.add_argument('--output', help='write the report to this CSV file')
+    report.set_defaults(func=run_report)
+
+    return parser
+
+def main(argv=None):
+    """Entry point for python -m src"""
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
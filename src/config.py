@@ -0,0 +1,16 @@
+import os
+import yaml
+
+_configs = {}
+
+def load_config(config_path='config.yaml'):
+    """Parse a config file once per process and return the shared dict.
+
+    Pipelines, DatabaseManager and the CLI all call this, so a run that builds
+    several of them still reads config.yaml only once.
+    """
+    key = os.path.abspath(config_path)
+    if key not in _configs:
+        with open(config_path, 'r') as file:
+            _configs[key] = yaml.safe_load(file)
+    return _configs[key]
@@ -1,14 +1,24 @@
+import sys
 import sqlite3
-import pandas as pd
-import yaml
+import time
 import os
 
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import load_config
+
+# pandas and numpy are imported inside the methods that need them so that
+# stats and health checks start without paying their import cost
+
 class DatabaseManager:
     def __init__(self, config_path='config.yaml'):
-        with open(config_path, 'r') as file:
-            self.config = yaml.safe_load(file)
+        self.config = load_config(config_path)
         self.db_path = self.config['database']['path']
         self.table_name = self.config['database']['table_name']
+        self.load_method = self.config['database'].get('load_method', 'executemany')
+        if self.load_method not in ('executemany', 'generic'):
+            raise ValueError(f"Unknown database.load_method '{self.load_method}'; use 'executemany' or 'generic'")
     
     def create_connection(self):
         """Create database connection"""
@@ -42,6 +52,23 @@ class DatabaseManager:
         ''')
         
         # Create processing_log table
+        self.create_processing_log_table(cursor)
+        
+        # Create change-data-capture tables
+        self.create_change_log_tables(cursor)
+        
+        # Create routing_log table
+        self.create_routing_log_table(cursor)
+        
+        # Create stream_daily_aggregates table
+        self.create_stream_aggregates_table(cursor)
+        
+        conn.commit()
+        conn.close()
+        print("Database tables created successfully!")
+    
+    def create_processing_log_table(self, cursor):
+        """Create the processing_log table"""
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS processing_log (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -52,16 +79,312 @@ class DatabaseManager:
                 status TEXT
             )
         ''')
+    
+    def create_change_log_tables(self, cursor):
+        """Create the change_log feed and consumer offset tables"""
+        # Ordered, offset-addressed log of every row written by insert_data
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                change_offset INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch_id INTEGER,
+                order_id TEXT,
+                change_type TEXT,
+                processing_type TEXT,
+                source_file TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         
-        conn.commit()
-        conn.close()
-        print("Database tables created successfully!")
+        # Last committed offset per downstream consumer
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_feed_offsets (
+                consumer_name TEXT PRIMARY KEY,
+                last_offset INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    def create_routing_log_table(self, cursor):
+        """Create the routing_log table for speed/batch routing decisions"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS routing_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT,
+                size_bytes INTEGER,
+                estimated_rows INTEGER,
+                rows_stored INTEGER,
+                route TEXT,
+                latency_seconds REAL,
+                status TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    def log_routing(self, filename, size_bytes, estimated_rows, rows_stored, route, latency_seconds, status):
+        """Record a routing decision and the end-to-end latency of its path"""
+        conn = self.create_connection()
+        
+        try:
+            cursor = conn.cursor()
+            self.create_routing_log_table(cursor)
+            cursor.execute(
+                "INSERT INTO routing_log (filename, size_bytes, estimated_rows, rows_stored, route, latency_seconds, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (filename, size_bytes, estimated_rows, rows_stored, route, latency_seconds, status)
+            )
+            conn.commit()
+        except Exception as e:
+            print(f"Error logging routing decision: {e}")
+        finally:
+            conn.close()
+    
+    def create_stream_aggregates_table(self, cursor):
+        """Create the per-day event-time aggregates maintained by the speed layer"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stream_daily_aggregates (
+                order_date TEXT PRIMARY KEY,
+                record_count INTEGER,
+                total_quantity REAL,
+                total_revenue REAL,
+                status TEXT,
+                revision INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    def apply_window_updates(self, updates):
+        """Add per-day deltas to stream_daily_aggregates.
+        
+        updates holds (order_date, record_count, total_quantity, total_revenue, is_correction)
+        tuples. Deltas are added to what is already stored, so the aggregates
+        survive restarts. A correction marks the window final and bumps its revision.
+        """
+        conn = self.create_connection()
+        
+        try:
+            cursor = conn.cursor()
+            self.create_stream_aggregates_table(cursor)
+            cursor.executemany('''
+                INSERT INTO stream_daily_aggregates
+                    (order_date, record_count, total_quantity, total_revenue, status, revision, updated_at)
+                VALUES (?, ?, ?, ?, CASE WHEN ? THEN 'final' ELSE 'open' END, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(order_date) DO UPDATE SET
+                    record_count = record_count + excluded.record_count,
+                    total_quantity = total_quantity + excluded.total_quantity,
+                    total_revenue = total_revenue + excluded.total_revenue,
+                    status = CASE WHEN excluded.status = 'final' THEN 'final' ELSE status END,
+                    revision = revision + excluded.revision,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', [
+                (day, count, quantity, revenue, int(is_correction), int(is_correction))
+                for day, count, quantity, revenue, is_correction in updates
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def close_windows(self, days):
+        """Mark per-day windows as final once the watermark has passed them"""
+        if not days:
+            return
+        
+        conn = self.create_connection()
+        
+        try:
+            cursor = conn.cursor()
+            self.create_stream_aggregates_table(cursor)
+            cursor.executemany(
+                "UPDATE stream_daily_aggregates SET status = 'final', updated_at = CURRENT_TIMESTAMP "
+                "WHERE order_date = ?",
+                [(day,) for day in days]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def close_windows_before(self, watermark):
+        """Mark every still-open window before the watermark as final"""
+        conn = self.create_connection()
+        
+        try:
+            cursor = conn.cursor()
+            self.create_stream_aggregates_table(cursor)
+            cursor.execute(
+                "UPDATE stream_daily_aggregates SET status = 'final', updated_at = CURRENT_TIMESTAMP "
+                "WHERE order_date < ? AND status = 'open'",
+                (watermark,)
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+    
+    def get_window_state(self, allowed_lateness_days):
+        """Return the latest stored order_date and the windows within allowed lateness of it.
+        
+        Used to restore event-time window state after a restart. Returns
+        (latest_date, rows) with rows of (order_date, record_count,
+        total_quantity, total_revenue, status); latest_date is None if no
+        windows are stored.
+        """
+        conn = self.create_connection()
+        
+        try:
+            cursor = conn.cursor()
+            self.create_stream_aggregates_table(cursor)
+            latest_date = cursor.execute("SELECT MAX(order_date) FROM stream_daily_aggregates").fetchone()[0]
+            if latest_date is None:
+                return None, []
+            
+            rows = cursor.execute(
+                "SELECT order_date, record_count, total_quantity, total_revenue, status "
+                "FROM stream_daily_aggregates WHERE order_date >= date(?, ?)",
+                (latest_date, f"-{int(allowed_lateness_days)} days")
+            ).fetchall()
+            return latest_date, rows
+        finally:
+            conn.close()
+    
+    def get_table_columns(self, conn):
+        """Return the column names of the sales table, creating it if missing"""
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table_name})")]
+        if not columns:
+            self.create_tables()
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table_name})")]
+        return columns
+    
+    def dataframe_to_rows(self, df):
+        """Convert a DataFrame to a list of row tuples for executemany.
+        
+        Works column-wise with Series.tolist() instead of going through
+        pandas' SQL layer. Datetime columns are rendered the same way
+        to_sql stores them; NaN binds as NULL in SQLite and pd.NA is
+        mapped to None.
+        """
+        import pandas as pd
+        
+        column_values = []
+        for col in df.columns:
+            series = df[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                values = self.datetimes_to_strings(series)
+            elif pd.api.types.is_extension_array_dtype(series.dtype) and series.hasnans:
+                # Nullable dtypes (Int64, boolean, string) yield pd.NA, which sqlite3 cannot bind
+                values = series.astype(object).where(series.notna(), None).tolist()
+            else:
+                values = series.tolist()
+            column_values.append(values)
+        return list(zip(*column_values))
+    
+    def datetimes_to_strings(self, series):
+        """Timestamp.isoformat(' ') for a datetime column, formatting each distinct value once"""
+        import numpy as np
+        import pandas as pd
+        
+        codes, uniques = pd.factorize(series)
+        strings = np.array([value.isoformat(' ') for value in uniques] + [None], dtype=object)
+        # NaT has code -1, which picks the trailing None
+        return strings[codes].tolist()
+    
+    def generic_rows(self, df):
+        """Convert a DataFrame to row tuples cell by cell, as pandas' SQL layer does"""
+        import pandas as pd
+        
+        converted = df.copy()
+        for col in converted.columns:
+            if pd.api.types.is_datetime64_any_dtype(converted[col]):
+                converted[col] = self.datetimes_to_strings(converted[col])
+        converted = converted.astype(object)
+        return list(converted.where(converted.notna(), None).itertuples(index=False, name=None))
+    
+    def executemany_insert(self, conn, df, generic=False, skip_existing=False):
+        """Insert a DataFrame with one prepared INSERT via executemany
+        
+        With generic, rows are built cell by cell like to_sql does. With
+        skip_existing, rows whose order_id is already stored are skipped by
+        INSERT OR IGNORE instead of failing the batch. Either way the INSERT
+        joins the caller's open transaction. Returns the number of rows inserted.
+        """
+        table_columns = set(self.get_table_columns(conn))
+        columns = [col for col in df.columns if col in table_columns]
+        rows = self.generic_rows(df[columns]) if generic else self.dataframe_to_rows(df[columns])
+        
+        placeholders = ", ".join("?" for _ in columns)
+        column_list = ", ".join(f'"{col}"' for col in columns)
+        verb = "INSERT OR IGNORE" if skip_existing else "INSERT"
+        cursor = conn.executemany(
+            f"{verb} INTO {self.table_name} ({column_list}) VALUES ({placeholders})",
+            rows
+        )
+        return cursor.rowcount
+    
+    def drop_secondary_indexes(self):
+        """Drop non-unique indexes on the sales table and return their SQL for rebuild_indexes.
+        
+        Call once before a bulk load and rebuild once after it. The
+        UNIQUE(order_id) autoindex cannot be dropped and is still maintained
+        row by row; unique indexes are kept so they keep rejecting duplicates.
+        The tables created by create_tables have no other indexes, so this
+        only matters for indexes added to the sales table by hand.
+        """
+        conn = self.create_connection()
+        
+        try:
+            index_sql = []
+            for _, name, unique, origin, _ in conn.execute(f"PRAGMA index_list({self.table_name})").fetchall():
+                if unique or origin != 'c':
+                    continue
+                index_sql.append(conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+                ).fetchone()[0])
+                conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+            conn.commit()
+            return index_sql
+        finally:
+            conn.close()
+    
+    def rebuild_indexes(self, index_sql):
+        """Recreate the indexes returned by drop_secondary_indexes"""
+        if not index_sql:
+            return
+        
+        conn = self.create_connection()
+        
+        try:
+            for sql in index_sql:
+                conn.execute(sql)
+            conn.commit()
+        finally:
+            conn.close()
     
-    def insert_data(self, df, processing_type="batch"):
-        """Insert DataFrame into database"""
+    def insert_data(self, df, processing_type="batch", method=None, bulk_mode=False, skip_existing=False):
+        """Insert DataFrame into database
+        
+        method is 'executemany' (column-wise row conversion) or 'generic'
+        (cell-by-cell conversion, as pandas' to_sql does); it defaults to
+        database.load_method in the config. Both bind through the same
+        executemany INSERT, since DataFrame.to_sql would commit on its own.
+        Sales rows, the processing_log entry and change_log commit
+        together in one transaction. bulk_mode turns off the journal and
+        sync for this connection. It is meant for initial historical loads
+        only, as a crash mid-load can corrupt the database; callers drop
+        and rebuild secondary indexes around the whole load themselves.
+        
+        With skip_existing, rows whose order_id is already stored are
+        skipped rather than failing the whole insert, and only the rows
+        actually inserted reach processing_log and change_log. Returns the
+        number of rows inserted, or None if the insert failed.
+        """
+        if method is None:
+            method = self.load_method
+        
         conn = self.create_connection()
         
         try:
+            if bulk_mode:
+                conn.execute("PRAGMA journal_mode = OFF")
+                conn.execute("PRAGMA synchronous = OFF")
+            
             # Remove any columns that don't exist in the table
             df_clean = df.copy()
             
@@ -73,24 +396,49 @@ class DatabaseManager:
                 if col not in df_clean.columns:
                     df_clean[col] = None
             
-            # Insert sales data
-            df_clean.to_sql(self.table_name, conn, if_exists='append', index=False)
+            # Take the write lock before reading the last id, so every row above
+            # it belongs to this batch. INSERT OR IGNORE still uses up ids for
+            # skipped rows, so the inserted ids are not contiguous
+            self.get_table_columns(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table_name}").fetchone()[0]
+            
+            # Insert sales data; everything commits once below
+            load_start = time.perf_counter()
+            inserted = self.executemany_insert(
+                conn, df_clean, generic=(method == 'generic'), skip_existing=skip_existing
+            )
+            load_seconds = time.perf_counter() - load_start
+            rows_per_sec = len(df_clean) / load_seconds if load_seconds > 0 else 0
             
             # Log the processing
-            log_data = pd.DataFrame({
-                'filename': [f'{processing_type}_processing'],
-                'records_processed': [len(df)],
-                'processing_type': [processing_type],
-                'status': ['success']
-            })
-            log_data.to_sql('processing_log', conn, if_exists='append', index=False)
+            cursor = conn.cursor()
+            self.create_processing_log_table(cursor)
+            cursor.execute(
+                "INSERT INTO processing_log (filename, records_processed, processing_type, status) "
+                "VALUES (?, ?, ?, ?)",
+                (f'{processing_type}_processing', inserted, processing_type, 'success')
+            )
+            batch_id = cursor.lastrowid
+            
+            # Append the inserted order_ids to the change feed in the same transaction
+            self.create_change_log_tables(cursor)
+            cursor.execute(
+                f"INSERT INTO change_log (batch_id, order_id, change_type, processing_type, source_file) "
+                f"SELECT ?, order_id, 'insert', ?, source_file FROM {self.table_name} "
+                f"WHERE id > ? ORDER BY id",
+                (batch_id, processing_type, last_id)
+            )
             
             conn.commit()
-            print(f"Inserted {len(df)} records successfully via {processing_type} processing!")
+            print(f"Inserted {inserted} records successfully via {processing_type} processing! "
+                  f"({rows_per_sec:,.0f} rows/sec via {method})")
+            return inserted
             
         except Exception as e:
             print(f"Error inserting data: {e}")
             conn.rollback()
+            return None
         finally:
             conn.close()
     
@@ -99,17 +447,21 @@ class DatabaseManager:
         conn = self.create_connection()
         
         try:
+            cursor = conn.cursor()
+            
             # Get record count
-            count_query = f"SELECT COUNT(*) as count FROM {self.table_name}"
-            count_result = pd.read_sql_query(count_query, conn)
+            count_query = f"SELECT COUNT(*) FROM {self.table_name}"
+            total_records = cursor.execute(count_query).fetchone()[0]
             
             # Get processing log
             log_query = "SELECT processing_type, COUNT(*) as batches, SUM(records_processed) as total_records FROM processing_log GROUP BY processing_type"
-            log_result = pd.read_sql_query(log_query, conn)
+            log_result = cursor.execute(log_query).fetchall()
             
-            print(f"Total records in database: {count_result['count'][0]}")
+            print(f"Total records in database: {total_records}")
             print("\nProcessing Statistics:")
-            print(log_result.to_string(index=False))
+            print(f"{'processing_type':>15} {'batches':>7} {'total_records':>13}")
+            for processing_type, batches, records in log_result:
+                print(f"{processing_type:>15} {batches:>7} {records or 0:>13}")
             
         except Exception as e:
             print(f"Error getting stats: {e}")
@@ -0,0 +1,36 @@
+import os
+from itertools import count
+
+def claim_file(file_path, claimed_dir):
+    """Atomically claim a file by moving it into claimed_dir.
+
+    The file is hard-linked into claimed_dir and then unlinked from its
+    source. Both steps are atomic, so when the batch scheduler, the stream
+    watcher and the router all see the same file, exactly one of them gets
+    it. os.link never replaces an existing file, so a file that reuses the
+    name of one still waiting in claimed_dir is claimed as name_1.csv and
+    so on. Returns the claimed path, or None if another process got there
+    first.
+    """
+    os.makedirs(claimed_dir, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(file_path))
+
+    for attempt in count():
+        candidate = f"{name}{ext}" if attempt == 0 else f"{name}_{attempt}{ext}"
+        claimed_path = os.path.join(claimed_dir, candidate)
+        try:
+            os.link(file_path, claimed_path)
+            break
+        except FileExistsError:
+            continue
+        except FileNotFoundError:
+            return None
+
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        # Another process linked the same file and removed the source first
+        os.unlink(claimed_path)
+        return None
+
+    return claimed_path
@@ -0,0 +1,250 @@
+import sys
+import os
+import glob
+import queue
+import threading
+import time
+import logging
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import load_config
+from src.database_setup import DatabaseManager
+from src.file_claim import claim_file
+
+class RouterFileHandler(FileSystemEventHandler):
+    def __init__(self, router):
+        self.router = router
+
+    def on_created(self, event):
+        """Handle new file creation"""
+        if event.is_directory:
+            return
+
+        if event.src_path.endswith('.csv'):
+            # Wait a moment to ensure file is completely written
+            time.sleep(1)
+            self.router.route_file(event.src_path)
+
+class FileRouter:
+    """Sends each file in the input directory to the speed or batch layer.
+
+    Small files go straight to the stream pipeline for low latency; large
+    files are queued for the chunked batch path on a background worker so
+    they never hold up the speed layer.
+
+    Run the router with routing.enabled set in config.yaml. The stream
+    watcher and the batch scheduler then leave the input directory alone,
+    and the router is its only reader, running both paths in-process.
+    With routing disabled, the stream watcher and batch scheduler share
+    the directory through claim_file, and a router started alongside them
+    only competes with them for files.
+    """
+
+    def __init__(self, config_path='config.yaml'):
+        self.config = load_config(config_path)
+
+        self.setup_logging()
+
+        # Import here so the router's logging configuration takes effect first
+        from src.batch_pipeline import BatchETLPipeline
+        from src.stream_pipeline import StreamETLPipeline
+
+        self.db_manager = DatabaseManager(config_path)
+        self.stream_pipeline = StreamETLPipeline(config_path)
+        self.batch_pipeline = BatchETLPipeline(config_path)
+
+        routing = self.config.get('routing', {})
+        self.small_file_max_bytes = routing.get('small_file_max_bytes', 1048576)
+        self.small_file_max_rows = routing.get('small_file_max_rows', 5000)
+        self.sample_bytes = routing.get('sample_bytes', 65536)
+        self.claimed_dir = self.config['paths'].get('claimed_dir', 'data/claimed')
+
+        self.batch_queue = queue.Queue()
+        self.batch_worker = None
+
+    def setup_logging(self):
+        """Setup logging configuration"""
+        log_dir = self.config['paths']['log_dir']
+        os.makedirs(log_dir, exist_ok=True)
+
+        logging.basicConfig(
+            level=getattr(logging, self.config['logging']['level']),
+            format=self.config['logging']['format'],
+            handlers=[
+                logging.FileHandler(f"{log_dir}/file_router.log"),
+                logging.StreamHandler()
+            ]
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def estimate_rows(self, file_path, size_bytes):
+        """Estimate the data row count from the line density of the file's head"""
+        with open(file_path, 'rb') as file:
+            sample = file.read(self.sample_bytes)
+
+        sample_lines = sample.count(b'\n')
+        if size_bytes <= len(sample) or sample_lines == 0:
+            return max(sample_lines - 1, 0)
+
+        bytes_per_line = len(sample) / sample_lines
+        return max(int(size_bytes / bytes_per_line) - 1, 0)
+
+    def choose_route(self, size_bytes, estimated_rows):
+        """Return 'stream' for small files and 'batch' for large ones"""
+        if size_bytes <= self.small_file_max_bytes and estimated_rows <= self.small_file_max_rows:
+            return 'stream'
+        return 'batch'
+
+    def route_file(self, file_path):
+        """Claim a file and dispatch it to the speed or batch layer"""
+        claimed_at = time.monotonic()
+        claimed_path = claim_file(file_path, self.claimed_dir)
+
+        if not claimed_path:
+            self.logger.info(f"Skipping {file_path}: already claimed by another process")
+            return None
+
+        try:
+            size_bytes = os.path.getsize(claimed_path)
+            estimated_rows = self.estimate_rows(claimed_path, size_bytes)
+        except OSError as e:
+            self.logger.error(f"Error inspecting {claimed_path}: {e}")
+            self.stream_pipeline.quarantine_file(claimed_path)
+            return None
+
+        route = self.choose_route(size_bytes, estimated_rows)
+        self.logger.info(
+            f"Routing {os.path.basename(claimed_path)} ({size_bytes} bytes, ~{estimated_rows} rows) to {route} path"
+        )
+
+        if route == 'stream':
+            self.run_route(route, claimed_path, size_bytes, estimated_rows, claimed_at)
+        else:
+            self.start_batch_worker()
+            self.batch_queue.put((claimed_path, size_bytes, estimated_rows, claimed_at))
+
+        return route
+
+    def run_route(self, route, file_path, size_bytes, estimated_rows, claimed_at):
+        """Process a claimed file on its path and record the latency and rows stored"""
+        rows_stored = 0
+        failed_chunks = 0
+
+        try:
+            if route == 'stream':
+                rows_stored = self.stream_pipeline.process_file(file_path)
+            else:
+                rows_stored = self.batch_pipeline.run_chunked(file_path)
+                failed_chunks = self.batch_pipeline.failed_chunks
+            status = 'success'
+        except Exception as e:
+            status = 'failed'
+            self.logger.error(f"Error processing {file_path} on {route} path: {e}")
+
+        # Both paths report load failures through their results, not exceptions.
+        # The batch path skips rows already stored, so only failed chunks count there
+        if status == 'success' and failed_chunks:
+            status = 'partial' if rows_stored else 'failed'
+        elif status == 'success' and route == 'stream' and rows_stored == 0 and estimated_rows > 0:
+            status = 'failed'
+
+        latency = time.monotonic() - claimed_at
+        self.db_manager.log_routing(
+            os.path.basename(file_path), size_bytes, estimated_rows, rows_stored, route, latency, status
+        )
+        self.logger.info(
+            f"{route} path finished {os.path.basename(file_path)} in {latency:.2f}s "
+            f"({rows_stored} rows stored, {status})"
+        )
+
+    def start_batch_worker(self):
+        """Start the background thread that drains the batch queue"""
+        if self.batch_worker and self.batch_worker.is_alive():
+            return
+
+        self.batch_worker = threading.Thread(target=self._batch_worker_loop, daemon=True)
+        self.batch_worker.start()
+
+    def _batch_worker_loop(self):
+        while True:
+            item = self.batch_queue.get()
+            if item is None:
+                self.batch_queue.task_done()
+                break
+
+            try:
+                self.run_route('batch', *item)
+            finally:
+                self.batch_queue.task_done()
+
+    def stop_batch_worker(self):
+        """Wait for queued batch files to finish and stop the worker"""
+        if self.batch_worker and self.batch_worker.is_alive():
+            self.batch_queue.put(None)
+            self.batch_worker.join()
+
+    def sweep(self):
+        """Route every CSV file already waiting in the input directory"""
+        input_dir = self.config['paths']['input_dir']
+        for file_path in sorted(glob.glob(f"{input_dir}/*.csv")):
+            self.route_file(file_path)
+
+    def start_monitoring(self):
+        """Route existing files, then watch the input directory for new ones"""
+        input_dir = self.config['paths']['input_dir']
+        os.makedirs(input_dir, exist_ok=True)
+
+        self.logger.info(f"Starting file router. Monitoring: {input_dir}")
+        if not self.config.get('routing', {}).get('enabled', False):
+            self.logger.warning("routing.enabled is off, so a running stream watcher or batch scheduler "
+                                "can still claim large files from the input directory")
+        self.sweep()
+
+        observer = Observer()
+        observer.schedule(RouterFileHandler(self), input_dir, recursive=False)
+        observer.start()
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.logger.info("Stopping file router...")
+            observer.stop()
+
+        observer.join()
+        self.stop_batch_worker()
+        self.logger.info("File router stopped")
+
+    def print_stats(self):
+        """Print routing decisions and per-path latency"""
+        conn = self.db_manager.create_connection()
+
+        try:
+            cursor = conn.cursor()
+            self.db_manager.create_routing_log_table(cursor)
+            rows = cursor.execute('''
+                SELECT route, COUNT(*), SUM(status != 'success'), SUM(estimated_rows), SUM(rows_stored),
+                       AVG(latency_seconds), MAX(latency_seconds)
+                FROM routing_log
+                GROUP BY route
+            ''').fetchall()
+
+            print("Routing Statistics:")
+            print(f"{'route':<8} {'files':>6} {'failed':>6} {'est_rows':>10} {'stored':>10} "
+                  f"{'avg_latency_s':>14} {'max_latency_s':>14}")
+            for route, files, failed, est_rows, stored, avg_latency, max_latency in rows:
+                print(f"{route:<8} {files:>6} {failed or 0:>6} {est_rows or 0:>10} {stored or 0:>10} "
+                      f"{avg_latency:>14.2f} {max_latency:>14.2f}")
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    router = FileRouter()
+    if len(sys.argv) > 1 and sys.argv[1] == 'stats':
+        router.print_stats()
+    else:
+        router.start_monitoring()
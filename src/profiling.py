@@ -0,0 +1,153 @@
+import os
+import cProfile
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+class StageProfiler:
+    """Per-stage cProfile and tracemalloc capture for pipeline runs.
+
+    When disabled, stage() only yields, so profiling adds no measurable
+    overhead to normal runs. When enabled, each run writes to the log
+    directory:
+      - profile_<name>_<ts>_<stage>.prof   pstats dump (snakeviz, flameprof, gprof2dot)
+      - profile_<name>_<ts>.folded         folded stacks for flamegraph.pl / speedscope
+      - profile_<name>_<ts>_memory.txt     stage timings, peak memory and top allocation sites
+    """
+
+    def __init__(self, name, log_dir='logs', enabled=False, top_allocations=15, max_depth=40):
+        self.name = name
+        self.log_dir = log_dir
+        self.enabled = enabled
+        self.top_allocations = top_allocations
+        self.max_depth = max_depth
+        self.reset()
+
+    def reset(self):
+        """Start a new run"""
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.stages = []
+
+    @contextmanager
+    def stage(self, stage_name):
+        """Profile the wrapped block as one pipeline stage"""
+        if not self.enabled:
+            yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+            allocations = after.compare_to(before, 'lineno')[:self.top_allocations]
+            self.stages.append((stage_name, elapsed, peak, profiler, allocations))
+
+    def write_report(self):
+        """Write profile, folded-stack and allocation files for the current run"""
+        if not self.enabled or not self.stages:
+            return None
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        prefix = f"{self.log_dir}/profile_{self.name}_{self.run_id}"
+
+        # Merge repeated stages (e.g. one per chunk) into a single entry
+        merged = {}
+        for stage_name, elapsed, peak, profiler, allocations in self.stages:
+            if stage_name not in merged:
+                merged[stage_name] = [0.0, 0, pstats.Stats(profiler), allocations]
+            else:
+                merged[stage_name][2].add(profiler)
+            merged[stage_name][0] += elapsed
+            merged[stage_name][1] = max(merged[stage_name][1], peak)
+
+        folded_lines = []
+        memory_lines = [f"Profile run {self.name} {self.run_id}", ""]
+        memory_lines.append(f"{'stage':<20} {'seconds':>10} {'peak_mb':>10}")
+        for stage_name, (elapsed, peak, _, _) in merged.items():
+            memory_lines.append(f"{stage_name:<20} {elapsed:>10.3f} {peak / 1048576:>10.2f}")
+
+        for stage_name, (_, _, stats, allocations) in merged.items():
+            stats.dump_stats(f"{prefix}_{stage_name}.prof")
+            folded_lines.extend(self._fold_stacks(stage_name, stats))
+
+            memory_lines.append("")
+            memory_lines.append(f"Top allocation sites in {stage_name}:")
+            for stat in allocations:
+                memory_lines.append(f"  {stat}")
+
+        with open(f"{prefix}.folded", 'w') as file:
+            file.write("\n".join(folded_lines) + "\n")
+
+        with open(f"{prefix}_memory.txt", 'w') as file:
+            file.write("\n".join(memory_lines) + "\n")
+
+        self.reset()
+        return prefix
+
+    def _fold_stacks(self, stage_name, stats):
+        """Convert pstats call-graph data into folded stacks.
+
+        cProfile records caller/callee edges rather than full stacks, so each
+        function's time is split across its callees in proportion to the
+        cumulative time of each edge, as flameprof does.
+        """
+        callees = {}
+        roots = []
+        for func, (_, _, _, _, callers) in stats.stats.items():
+            known_callers = [caller for caller in callers if caller in stats.stats]
+            if not known_callers:
+                roots.append(func)
+            for caller in known_callers:
+                callees.setdefault(caller, []).append((func, callers[caller][3]))
+
+        lines = []
+
+        def walk(func, stack, budget):
+            # Paths below a microsecond would not show up in a flamegraph
+            if budget < 1e-6:
+                return
+
+            _, _, total_time, cumulative_time, _ = stats.stats[func]
+            frame = self._frame_label(func)
+            stack = stack + [frame]
+            scale = budget / cumulative_time if cumulative_time else 0
+
+            self_us = int(total_time * scale * 1e6)
+            if self_us > 0:
+                lines.append(f"{';'.join(stack)} {self_us}")
+
+            if len(stack) >= self.max_depth:
+                return
+            for callee, edge_time in callees.get(func, []):
+                if self._frame_label(callee) in stack:
+                    continue
+                walk(callee, stack, edge_time * scale)
+
+        for root in roots:
+            walk(root, [stage_name], stats.stats[root][3])
+
+        return lines
+
+    @staticmethod
+    def _frame_label(func):
+        filename, line, name = func
+        if filename == '~':
+            return name
+        return f"{name} ({os.path.basename(filename)}:{line})"
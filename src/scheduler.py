@@ -8,31 +8,33 @@ from datetime import datetime
 # Add the parent directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.batch_pipeline import BatchETLPipeline
-
-def run_batch_job():
+def run_batch_job(config_path='config.yaml', profile=False):
     """Run the batch ETL pipeline"""
     print(f"\n{'='*50}")
     print(f"Running batch job at: {datetime.now()}")
     print(f"{'='*50}")
     
     try:
-        pipeline = BatchETLPipeline()
+        # Imported per run so the scheduler itself starts without loading pandas
+        from src.batch_pipeline import BatchETLPipeline
+        pipeline = BatchETLPipeline(config_path, profile=profile)
         pipeline.run_pipeline()
     except Exception as e:
         logging.error(f"Batch job failed: {e}")
 
-def main():
+def main(config_path='config.yaml', profile=False):
     """Main scheduler function"""
     print("Starting ETL Scheduler...")
     print("Batch jobs will run every 5 minutes")
+    if profile:
+        print("Profiling enabled: per-run profiles are written to logs/")
     print("Press Ctrl+C to stop")
     
     # Schedule batch job every 5 minutes
-    schedule.every(5).minutes.do(run_batch_job)
+    schedule.every(5).minutes.do(run_batch_job, config_path, profile=profile)
     
     # Run initial batch job
-    run_batch_job()
+    run_batch_job(config_path, profile)
     
     try:
         while True:
@@ -42,4 +44,4 @@ def main():
         print("\nScheduler stopped")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(profile='--profile' in sys.argv)
\ No newline at end of file
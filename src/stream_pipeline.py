@@ -2,7 +2,6 @@ import sys
 import os
 import pandas as pd
 import time
-import yaml
 import logging
 from datetime import datetime
 from watchdog.observers import Observer
@@ -11,7 +10,11 @@ from watchdog.events import FileSystemEventHandler
 # Add the parent directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.config import load_config
 from src.database_setup import DatabaseManager
+from src.file_claim import claim_file
+from src.profiling import StageProfiler
+from src.stream_windows import EventTimeWindows
 
 class StreamFileHandler(FileSystemEventHandler):
     def __init__(self, stream_processor):
@@ -26,17 +29,28 @@ class StreamFileHandler(FileSystemEventHandler):
         if event.src_path.endswith('.csv'):
             # Wait a moment to ensure file is completely written
             time.sleep(1)
-            self.stream_processor.process_file(event.src_path)
+            
+            # Claim the file so the batch scheduler cannot pick it up too
+            claimed_dir = self.stream_processor.config['paths'].get('claimed_dir', 'data/claimed')
+            claimed_path = claim_file(event.src_path, claimed_dir)
+            if claimed_path:
+                self.stream_processor.process_file(claimed_path)
 
 class StreamETLPipeline:
-    def __init__(self, config_path='config.yaml'):
-        # Load configuration
-        with open(config_path, 'r') as file:
-            self.config = yaml.safe_load(file)
+    def __init__(self, config_path='config.yaml', profile=False):
+        self.config = load_config(config_path)
         
         self.db_manager = DatabaseManager(config_path)
         self.setup_logging()
         self.processed_count = 0
+        self.profiler = StageProfiler('stream', self.config['paths']['log_dir'], enabled=profile)
+        
+        stream_config = self.config.get('stream', {})
+        self.windows = EventTimeWindows(
+            self.db_manager,
+            allowed_lateness_days=stream_config.get('allowed_lateness_days', 2),
+            max_open_windows=stream_config.get('max_open_windows', 31)
+        )
     
     def setup_logging(self):
         """Setup logging configuration"""
@@ -77,35 +91,65 @@ class StreamETLPipeline:
             return None
     
     def process_file(self, file_path):
-        """Process a single CSV file in streaming fashion"""
+        """Process a single CSV file in streaming fashion
+        
+        Returns the number of records stored. Files that fail to read or
+        load are moved to the failed directory instead of being archived.
+        """
         self.logger.info(f"Processing new file: {file_path}")
+        stored = 0
         
         try:
             # Read CSV file
-            df = pd.read_csv(file_path)
+            with self.profiler.stage('extract'):
+                df = pd.read_csv(file_path)
             
             # Process records one by one (simulating streaming)
             valid_records = []
             
-            for _, row in df.iterrows():
-                transformed_record = self.transform_record(row.to_dict())
-                if transformed_record:
-                    valid_records.append(transformed_record)
+            with self.profiler.stage('transform'):
+                for _, row in df.iterrows():
+                    transformed_record = self.transform_record(row.to_dict())
+                    if transformed_record:
+                        valid_records.append(transformed_record)
             
             if valid_records:
                 # Convert to DataFrame and insert
-                processed_df = pd.DataFrame(valid_records)
-                self.db_manager.insert_data(processed_df, processing_type="stream")
+                with self.profiler.stage('load'):
+                    processed_df = pd.DataFrame(valid_records)
+                    loaded = self.db_manager.insert_data(processed_df, processing_type="stream")
                 
-                self.processed_count += len(processed_df)
-                self.logger.info(f"Processed {len(processed_df)} records from {file_path}")
-                self.logger.info(f"Total processed so far: {self.processed_count}")
+                # Update event-time windows only with records that were stored
+                if loaded is not None:
+                    stored = loaded
+                    with self.profiler.stage('windows'):
+                        self.windows.process(processed_df)
+                    
+                    self.processed_count += stored
+                    self.logger.info(f"Processed {stored} records from {file_path}")
+                    self.logger.info(f"Total processed so far: {self.processed_count}")
+                else:
+                    self.logger.error(f"Failed to store {len(processed_df)} records from {file_path}")
+                    self.quarantine_file(file_path)
+                    return stored
             
             # Move processed file
-            self.archive_processed_file(file_path)
+            with self.profiler.stage('archive'):
+                self.archive_processed_file(file_path)
             
         except Exception as e:
             self.logger.error(f"Error processing file {file_path}: {e}")
+            # Once its records are stored the file is done, even if the window update failed
+            if stored:
+                self.archive_processed_file(file_path)
+            else:
+                self.quarantine_file(file_path)
+        finally:
+            prefix = self.profiler.write_report()
+            if prefix:
+                self.logger.info(f"Profile written to {prefix}.*")
+        
+        return stored
     
     def archive_processed_file(self, file_path):
         """Move processed file to archive"""
@@ -123,11 +167,24 @@ class StreamETLPipeline:
         except Exception as e:
             self.logger.error(f"Error moving file {file_path}: {e}")
     
+    def quarantine_file(self, file_path):
+        """Move a claimed file that could not be processed to the failed directory"""
+        failed_dir = self.config['paths'].get('failed_dir', 'data/failed')
+        failed_path = claim_file(file_path, failed_dir)
+        if failed_path:
+            self.logger.warning(f"Moved {os.path.basename(file_path)} to {failed_path} for inspection")
+    
     def start_monitoring(self):
         """Start monitoring the input directory for new files"""
         input_dir = self.config['paths']['input_dir']
         os.makedirs(input_dir, exist_ok=True)
         
+        if self.config.get('routing', {}).get('enabled', False):
+            # The file router runs this pipeline in-process for small files
+            self.logger.error(f"File routing is enabled, so {input_dir} is owned by the router. "
+                              f"Run 'python -m src route' instead of the stream watcher")
+            return
+        
         self.logger.info(f"Starting stream processing. Monitoring: {input_dir}")
         
         event_handler = StreamFileHandler(self)
@@ -147,5 +204,5 @@ class StreamETLPipeline:
         self.logger.info("Stream processing stopped")
 
 if __name__ == "__main__":
-    stream_pipeline = StreamETLPipeline()
+    stream_pipeline = StreamETLPipeline(profile='--profile' in sys.argv)
     stream_pipeline.start_monitoring()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import logging
+import pandas as pd
+
+class EventTimeWindows:
+    """Per-day event-time windows over order_date for the speed layer.
+
+    The watermark trails the latest order_date seen by allowed_lateness_days.
+    A window is open until the watermark passes it, or until it is evicted
+    because more than max_open_windows are open. Then it is marked final.
+    Rows that arrive for a final window are late. They are applied as
+    corrections to the stored aggregate, which bumps its revision.
+
+    Only open windows are kept in memory, so state stays bounded by
+    max_open_windows however long the stream runs. Aggregates are written
+    as additive deltas to stream_daily_aggregates. On start the watermark,
+    open windows and early-closed windows are restored from that table, so
+    late rows after a restart are still treated as corrections.
+    """
+
+    def __init__(self, db_manager, allowed_lateness_days=2, max_open_windows=31):
+        self.db_manager = db_manager
+        self.allowed_lateness = pd.Timedelta(days=allowed_lateness_days)
+        self.max_open_windows = max_open_windows
+        self.logger = logging.getLogger(__name__)
+
+        self.open_windows = {}
+        self.evicted_days = set()
+        self.watermark = None
+        self.on_time_records = 0
+        self.late_records = 0
+        self.restore_state()
+
+    def restore_state(self):
+        """Seed the watermark and window state from stream_daily_aggregates"""
+        latest_date, rows = self.db_manager.get_window_state(self.allowed_lateness.days)
+        if latest_date is None:
+            return
+
+        self.watermark = (pd.Timestamp(latest_date) - self.allowed_lateness).strftime('%Y-%m-%d')
+        for day, count, quantity, revenue, status in rows:
+            if day < self.watermark:
+                continue
+            if status == 'final':
+                self.evicted_days.add(day)
+            else:
+                self.open_windows[day] = [count, quantity, revenue]
+
+        # Windows left open behind the watermark by an earlier run are closed now
+        stale = self.db_manager.close_windows_before(self.watermark)
+        self.logger.info(
+            f"Restored watermark {self.watermark} with {len(self.open_windows)} open windows "
+            f"({stale} stale windows closed)"
+        )
+
+    def is_closed(self, day):
+        """Return True if the window for day has already been finalised"""
+        if self.watermark is not None and day < self.watermark:
+            return True
+        return day in self.evicted_days
+
+    def process(self, df):
+        """Assign a micro-batch of transformed records to windows and advance the watermark"""
+        event_times = pd.to_datetime(df['order_date'], errors='coerce')
+        valid = event_times.notna()
+        if not valid.any():
+            return []
+
+        batch = pd.DataFrame({
+            'day': event_times[valid].dt.strftime('%Y-%m-%d'),
+            'quantity': pd.to_numeric(df.loc[valid, 'quantity'], errors='coerce'),
+            'total_amount': pd.to_numeric(df.loc[valid, 'total_amount'], errors='coerce'),
+        })
+        daily = batch.groupby('day').agg(
+            record_count=('day', 'size'),
+            total_quantity=('quantity', 'sum'),
+            total_revenue=('total_amount', 'sum'),
+        )
+
+        updates = []
+        for day, row in daily.iterrows():
+            count = int(row['record_count'])
+            is_late = self.is_closed(day)
+
+            if is_late:
+                self.late_records += count
+                self.logger.debug(f"Late arrival: {count} records for closed window {day}, applying correction")
+            else:
+                self.on_time_records += count
+                window = self.open_windows.setdefault(day, [0, 0.0, 0.0])
+                window[0] += count
+                window[1] += float(row['total_quantity'])
+                window[2] += float(row['total_revenue'])
+
+            updates.append((day, count, float(row['total_quantity']), float(row['total_revenue']), is_late))
+
+        self.db_manager.apply_window_updates(updates)
+        self.advance_watermark(event_times[valid].max())
+        return updates
+
+    def advance_watermark(self, max_event_time):
+        """Move the watermark forward and close windows that fall behind it or exceed capacity"""
+        candidate = (max_event_time - self.allowed_lateness).strftime('%Y-%m-%d')
+        if self.watermark is None or candidate > self.watermark:
+            self.watermark = candidate
+
+        closing = sorted(day for day in self.open_windows if day < self.watermark)
+
+        # Evict the oldest open windows if there are too many to keep in memory
+        remaining = sorted(day for day in self.open_windows if day >= self.watermark)
+        overflow = remaining[:max(len(remaining) - self.max_open_windows, 0)]
+        self.evicted_days.update(overflow)
+        closing.extend(overflow)
+
+        # Days behind the watermark are covered by it; drop them from the eviction set
+        self.evicted_days = {day for day in self.evicted_days if day >= self.watermark}
+
+        if closing:
+            self.db_manager.close_windows(closing)
+            for day in closing:
+                count, _, revenue = self.open_windows.pop(day)
+                self.logger.debug(f"Closed window {day}: {count} records, revenue {revenue:.2f}")
+
+        self.logger.info(
+            f"Watermark at {self.watermark}; closed {len(closing)} and kept {len(self.open_windows)} open windows, "
+            f"{self.on_time_records} on-time and {self.late_records} late records so far"
+        )
@@ -1,16 +1,17 @@
 import sys
 import os
-import pandas as pd
 import sqlite3
 
 # Add the parent directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.data_generator import generate_sales_data
 from src.database_setup import DatabaseManager
 
 def test_batch_pipeline():
     """Test the batch pipeline"""
+    import pandas as pd
+    from src.data_generator import generate_sales_data
+    
     print("Testing Batch Pipeline...")
     
     # Generate test data
@@ -45,6 +46,8 @@ def test_stream_pipeline():
     print("2. Then add a test file by running:")
     print("   python -c \"from src.data_generator import generate_sales_data; generate_sales_data(50, 'data/input/test_stream.csv')\"")
     
+    from src.data_generator import generate_sales_data
+    
     # Generate test data for streaming
     os.makedirs('data/input', exist_ok=True)
     generate_sales_data(50, 'data/input/test_stream_ready.csv')
@@ -53,6 +56,8 @@ def test_stream_pipeline():
 
 def view_database_stats():
     """View database statistics"""
+    import pandas as pd
+    
     try:
         db_manager = DatabaseManager()
         conn = db_manager.create_connection()